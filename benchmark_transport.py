@@ -0,0 +1,81 @@
+"""
+Benchmark of portfolio store encodings: split JSON vs base64 Arrow IPC vs base64 Parquet
+
+Prints payload size, encode and decode time, and whether the dtypes survive
+the round trip, for ingested portfolios of 1k, 100k and 1M rows.
+
+Usage: python benchmark_transport.py [rows ...]
+"""
+
+import base64
+import io
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from app import ingest_portfolio, encode_frame, decode_frame
+
+
+def sample_portfolio(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    years = rng.integers(1, 31, rows)
+    coupon = rng.uniform(1.0, 7.0, rows).round(3)
+    return pd.DataFrame({
+        'Fund_ID': pd.Categorical([f"Fund_{i:02d}" for i in rng.integers(0, 40, rows)]),
+        'Bond_Name': [f"Bond {i}" for i in range(rows)],
+        'Face_Value': 1000.0,
+        'Coupon_Rate': coupon,
+        'Years_To_Maturity': years.astype(float),
+        'Market_Price': (1000 + (coupon - 4.0) * years * 8 + rng.normal(0, 5, rows)).round(2),
+        'Quantity': rng.integers(1, 100, rows).astype(float),
+        'Frequency': np.int8(2)
+    })
+
+
+def encode_json(df):
+    return df.to_json(date_format='iso', orient='split')
+
+
+def decode_json(payload):
+    return pd.read_json(io.StringIO(payload), orient='split')
+
+
+def encode_parquet(df):
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False, compression='zstd')
+    return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def decode_parquet(payload):
+    return pq.read_table(io.BytesIO(base64.b64decode(payload))).to_pandas()
+
+
+ENCODINGS = {
+    'split JSON': (encode_json, decode_json),
+    'Arrow IPC + base64': (encode_frame, decode_frame),
+    'Parquet + base64': (encode_parquet, decode_parquet)
+}
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main(sizes):
+    print(f"{'rows':>9}  {'encoding':<20}{'payload MB':>11}{'encode s':>10}{'decode s':>10}  dtypes kept")
+    for rows in sizes:
+        table = ingest_portfolio(sample_portfolio(rows))[0]
+        for name, (encode, decode) in ENCODINGS.items():
+            payload, encode_time = timed(encode, table)
+            decoded, decode_time = timed(decode, payload)
+            kept = (decoded.dtypes == table.dtypes).all()
+            print(f"{rows:>9,}  {name:<20}{len(payload) / 2**20:>11.2f}{encode_time:>10.3f}{decode_time:>10.3f}  {kept}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 100_000, 1_000_000])
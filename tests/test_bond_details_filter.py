@@ -0,0 +1,68 @@
+"""Server-side DataTable filtering of the bond details table"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import query_bond_details
+
+
+@pytest.fixture
+def bond_details():
+    return pd.DataFrame({
+        'Bond Name': ['US Treasury 10Y', 'Hedge ge 2', 'corp treasury', 'Muni 10.0', 'Bond 2'],
+        'YTM (%)': [4.1, 6.5, 5.0, 3.2, 7.0],
+        'Quantity': [10, 20, 30, 40, 50],
+    })
+
+
+def names(result):
+    return list(result['Bond Name'])
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('{Bond Name} scontains Treasury', ['US Treasury 10Y']),
+    ('{Bond Name} icontains treasury', ['US Treasury 10Y', 'corp treasury']),
+    ('{Bond Name} contains Treasury', ['US Treasury 10Y']),
+    ('{Bond Name} contains 10', ['US Treasury 10Y', 'Muni 10.0']),
+    ('{Bond Name} scontains Hedge ge 2', ['Hedge ge 2']),
+    ('{Bond Name} scontains "Hedge ge 2"', ['Hedge ge 2']),
+    ('{Bond Name} s= Bond 2', ['Bond 2']),
+    ('{Bond Name} i= bond 2', ['Bond 2']),
+    ('{Bond Name} ne Bond 2', ['US Treasury 10Y', 'Hedge ge 2', 'corp treasury', 'Muni 10.0']),
+])
+def test_text_filters(bond_details, query, expected):
+    assert names(query_bond_details(bond_details, query)) == expected
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('{YTM (%)} s> 5', ['Hedge ge 2', 'Bond 2']),
+    ('{YTM (%)} >= 5', ['Hedge ge 2', 'corp treasury', 'Bond 2']),
+    ('{YTM (%)} lt 4.1', ['Muni 10.0']),
+    ('{YTM (%)} le 4.1', ['US Treasury 10Y', 'Muni 10.0']),
+    ('{Quantity} = 30', ['corp treasury']),
+    ('{Quantity} != 30', ['US Treasury 10Y', 'Hedge ge 2', 'Muni 10.0', 'Bond 2']),
+    ('{YTM (%)} scontains 6', ['Hedge ge 2']),
+])
+def test_numeric_filters(bond_details, query, expected):
+    assert names(query_bond_details(bond_details, query)) == expected
+
+
+def test_clauses_are_combined(bond_details):
+    query = '{Bond Name} icontains treasury && {YTM (%)} s> 4.5 && {Quantity} <= 30'
+    assert names(query_bond_details(bond_details, query)) == ['corp treasury']
+
+
+def test_unknown_columns_and_values_are_ignored(bond_details):
+    query = '{Rating} scontains AA && {YTM (%)} > abc && {Bond Name} scontains Bond'
+    assert names(query_bond_details(bond_details, query)) == ['Bond 2']
+    assert len(query_bond_details(bond_details, '')) == len(bond_details)
+
+
+def test_sort_by(bond_details):
+    result = query_bond_details(bond_details, '{Quantity} > 10', [{'column_id': 'YTM (%)', 'direction': 'desc'}])
+    assert names(result) == ['Bond 2', 'Hedge ge 2', 'corp treasury', 'Muni 10.0']
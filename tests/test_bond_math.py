@@ -0,0 +1,98 @@
+"""Closed-form bond analytics checked against the summation formulas and scipy's brentq"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+from scipy.optimize import brentq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import convexity, macaulay_duration, solve_ytm
+
+
+def cash_flows(coupon_payment, face_value, periods):
+    t = np.arange(1, periods + 1)
+    return t, np.where(t < periods, coupon_payment, coupon_payment + face_value)
+
+
+def summed_price(ytm, coupon_payment, face_value, periods, frequency):
+    t, cf = cash_flows(coupon_payment, face_value, periods)
+    return (cf / (1 + ytm / frequency) ** t).sum() if periods > 0 else face_value
+
+
+def summed_macaulay_duration(ytm, coupon_payment, face_value, periods, frequency, price):
+    y = ytm / frequency
+    t, cf = cash_flows(coupon_payment, face_value, periods)
+    return (t * cf / (1 + y) ** t).sum() / price / frequency
+
+
+def summed_convexity(ytm, coupon_payment, face_value, periods, frequency, price):
+    y = ytm / frequency
+    t, cf = cash_flows(coupon_payment, face_value, periods)
+    return (t * (t + 1) * cf / (1 + y) ** t).sum() / (price * (1 + y) ** 2 * frequency ** 2)
+
+
+YIELDS = [-0.05, -1e-4, 0.0, 1e-9, 1e-5, 0.001, 0.03, 0.0725, 0.2, 0.6]
+TENORS = [(1, 0.5), (2, 1), (2, 5), (4, 7.25), (12, 10), (2, 30), (1, 50)]
+
+
+@pytest.mark.parametrize('ytm', YIELDS)
+@pytest.mark.parametrize('frequency, years', TENORS)
+def test_closed_forms_match_sums(ytm, frequency, years):
+    face_value, coupon_rate = 1000.0, 0.045
+    coupon_payment = face_value * coupon_rate / frequency
+    periods = int(years * frequency)
+    price = summed_price(ytm, coupon_payment, face_value, periods, frequency)
+    
+    assert macaulay_duration(ytm, coupon_payment, face_value, periods, frequency, price) == pytest.approx(
+        summed_macaulay_duration(ytm, coupon_payment, face_value, periods, frequency, price), rel=1e-9)
+    assert convexity(ytm, coupon_payment, face_value, periods, frequency, price) == pytest.approx(
+        summed_convexity(ytm, coupon_payment, face_value, periods, frequency, price), rel=1e-9)
+    # Default price is the model price at ytm
+    assert macaulay_duration(ytm, coupon_payment, face_value, periods, frequency) == pytest.approx(
+        summed_macaulay_duration(ytm, coupon_payment, face_value, periods, frequency, price), rel=1e-9)
+
+
+def test_closed_forms_vectorized():
+    ytm = np.array(YIELDS)
+    frequency, periods, coupon_payment, face_value = 2, 20, 25.0, 1000.0
+    prices = np.array([summed_price(y, coupon_payment, face_value, periods, frequency) for y in ytm])
+    expected = [summed_convexity(y, coupon_payment, face_value, periods, frequency, p) for y, p in zip(ytm, prices)]
+    np.testing.assert_allclose(convexity(ytm, coupon_payment, face_value, periods, frequency, prices), expected, rtol=1e-9)
+
+
+def test_zero_period_bond():
+    # A matured bond is worth its face value and has no rate sensitivity
+    assert macaulay_duration(0.05, 25.0, 1000.0, 0, 2, 1000.0) == 0
+    assert convexity(0.05, 25.0, 1000.0, 0, 2, 1000.0) == 0
+
+
+def test_solve_ytm_matches_brentq():
+    rng = np.random.default_rng(7)
+    n = 500
+    frequency = rng.choice([1, 2, 4, 12], n)
+    periods = rng.integers(1, 61, n) * frequency // 2 + 1
+    face_value = np.full(n, 1000.0)
+    coupon_payment = face_value * rng.uniform(0, 0.1, n) / frequency
+    market_price = face_value * rng.uniform(0.6, 1.5, n)
+    
+    ytm, converged = solve_ytm(market_price, coupon_payment, face_value, periods, frequency)
+    for i in range(n):
+        def diff(y):
+            return summed_price(y, coupon_payment[i], face_value[i], periods[i], frequency[i]) - market_price[i]
+        if diff(-0.1) * diff(1.0) > 0:
+            # No root in the bracket: flagged, not guessed
+            assert not converged[i]
+            continue
+        assert converged[i]
+        assert ytm[i] == pytest.approx(brentq(diff, -0.1, 1.0, xtol=1e-14), abs=1e-10)
+
+
+def test_solve_ytm_flags_prices_without_a_root():
+    # Prices above the value at -10% or below the value at 100% have no yield in the bracket
+    market_price = np.array([1000.0, 5000.0, 50.0, 980.0])
+    ytm, converged = solve_ytm(market_price, 25.0, 1000.0, 10, 2)
+    assert converged.tolist() == [True, False, False, True]
+    assert ytm[0] == pytest.approx(0.05, abs=1e-12)
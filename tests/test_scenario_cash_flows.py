@@ -0,0 +1,58 @@
+"""The browser's scenario reprice (SCENARIO_CHART_JS on scenario_cash_flows) against generate_scenario_data"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import SCENARIO_CHART_JS, BondBook, ZeroCurve, generate_scenario_data, scenario_cash_flows
+
+NODE = shutil.which('node')
+SHIFT_RANGE = (-500, 500, 25)
+# Stated accuracy of the yield-mode bucket reprice (see scenario_cash_flows)
+YIELD_MODE_RTOL = 1e-5
+
+
+@pytest.fixture(scope='module')
+def book():
+    # Mixed yields (prices from 70 to 130), coupons, maturities and frequencies
+    rng = np.random.default_rng(7)
+    n = 5000
+    return BondBook.from_dataframe(pd.DataFrame({
+        'Bond_Name': [f"B{i}" for i in range(n)],
+        'Face_Value': 1000,
+        'Coupon_Rate': rng.uniform(0, 9, n).round(2),
+        'Years_To_Maturity': rng.integers(1, 31, n),
+        'Market_Price': rng.uniform(700, 1300, n).round(2),
+        'Quantity': rng.integers(1, 50, n),
+        'Frequency': rng.choice([1, 2, 4, 12], n)
+    }))
+
+
+def client_values(summary):
+    # Run the clientside callback in node and return the scenario table's portfolio values
+    figure = {'data': [{}], 'layout': {'shapes': [{}], 'annotations': [{}], 'title': {}}}
+    args = json.dumps([summary, list(SHIFT_RANGE[:2]), SHIFT_RANGE[2], figure])
+    script = f"const f = {SCENARIO_CHART_JS};\nconsole.log(JSON.stringify(f(...{args})[1]));"
+    output = subprocess.run([NODE, '-e', script], capture_output=True, text=True, check=True).stdout
+    return pd.DataFrame(json.loads(output))['Portfolio Value'].to_numpy()
+
+
+@pytest.mark.skipif(NODE is None, reason="needs node to run the clientside callback")
+def test_yield_mode_matches_full_reprice(book):
+    exact = generate_scenario_data(book, shift_range=SHIFT_RANGE)['Portfolio Value'].to_numpy()
+    np.testing.assert_allclose(client_values(scenario_cash_flows(book)), exact, rtol=YIELD_MODE_RTOL)
+
+
+@pytest.mark.skipif(NODE is None, reason="needs node to run the clientside callback")
+def test_curve_mode_is_exact(book):
+    curve = ZeroCurve.bootstrap([0.5, 2, 5, 10, 30], [0.04, 0.042, 0.045, 0.047, 0.05])
+    exact = generate_scenario_data(book, shift_range=SHIFT_RANGE, curve=curve)['Portfolio Value'].to_numpy()
+    np.testing.assert_allclose(client_values(scenario_cash_flows(book, curve)), exact, rtol=1e-9)